@@ -1,7 +1,13 @@
 import requests
 import pyodbc
 import json
+import os
+import sys
 import time
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import schedule
 
@@ -18,6 +24,9 @@ CREATE_UPDATE_PRODUCT_URL = f"{BASE_URL}/CreateUpdateProduct/"
 CREATE_UPDATE_STOCK_URL = f"{BASE_URL}/CreateUpdateStock/"
 CREATE_UPDATE_PRICE_URL = f"{BASE_URL}/CreateUpdatePrice/"
 ORDER_URL = f"{BASE_URL}/GetOrders/"
+START_ORDER_HANDLING_URL = f"{BASE_URL}/Sync/StartOrderHandling"
+GENERATE_INVOICE_URL = f"{BASE_URL}/Sync/GenerateInvoice"
+CANCEL_ORDER_URL = f"{BASE_URL}/Sync/CancelOrder"
 
 
 
@@ -27,6 +36,33 @@ ORDER_URL = f"{BASE_URL}/GetOrders/"
 DB_CONNECTION = "DRIVER={ODBC Driver 17 for SQL Server};SERVER=localhost;DATABASE=OnlineAPI;UID=test;PWD=test"
 LOG_FILE = "log.txt"
 
+# Adaptive (AIMD) concurrency limits applied per endpoint
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+INITIAL_CONCURRENCY = 4
+LATENCY_THRESHOLD = 5.0  # seconds; slower responses count as congestion
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN = 5.0  # seconds; minimum time between two decreases
+CONCURRENCY_LOG_FILE = "concurrency_log.txt"
+
+# Order ingestion pipeline: bounded queues and DB batch size
+ORDER_FETCH_QUEUE_SIZE = 8  # fetched location responses waiting to be normalized
+ORDER_ROW_QUEUE_SIZE = 2000  # normalized rows waiting for the DB writer
+ORDER_BATCH_SIZE = 200
+
+# Opt-in profiling of scheduled jobs, configured through environment variables
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_TOP_N = int(os.environ.get("PROFILE_TOP_N", "10"))  # slowest HTTP calls and SQL statements logged per run
+
+# Log concurrency limit changes to a separate file for tuning
+def log_concurrency(message):
+    """Log concurrency limit changes to a file with timestamp."""
+    with open(CONCURRENCY_LOG_FILE, "a") as log:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log.write(f"[{timestamp}] {message}\n")
+
 # Log error messages to a file
 def log_error(message):
     """Log errors to a file with timestamp.""" 
@@ -53,13 +89,279 @@ def retry_request(func, max_retries=5, delay=2, *args, **kwargs):
 
 
 
+# Additive-increase / multiplicative-decrease limiter for in-flight requests
+class AdaptiveLimiter:
+    """
+    Limit the number of in-flight requests to one endpoint.
+    The limit grows by about one per window of healthy responses while the
+    limiter is saturated, and is
+    cut by DECREASE_FACTOR on errors or responses slower than LATENCY_THRESHOLD,
+    at most once per DECREASE_COOLDOWN. Changes of the limit are logged.
+    """
+
+    def __init__(self, name, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY,
+                 maximum=MAX_CONCURRENCY, latency_threshold=LATENCY_THRESHOLD):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_threshold = latency_threshold
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, success):
+        with self._condition:
+            previous_limit = int(self.limit)
+            # Only grow the limit when it was actually reached, untested levels stay closed
+            saturated = self.in_flight + 1 >= previous_limit
+            self.in_flight -= 1
+            now = time.monotonic()
+            if success and latency <= self.latency_threshold:
+                if saturated:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif now - self._last_decrease >= DECREASE_COOLDOWN:
+                # Only back off once per congestion event
+                self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+                self._last_decrease = now
+            current_limit = int(self.limit)
+            in_flight = self.in_flight
+            self._condition.notify_all()
+
+        if current_limit != previous_limit:
+            log_concurrency(f"Concurrency limit for {self.name}: {previous_limit} -> {current_limit} "
+                            f"(in flight: {in_flight}, latency: {latency:.2f}s, success: {success})")
+
+
+ENDPOINT_LIMITERS = {
+    url: AdaptiveLimiter(url)
+    for url in (
+        CREATE_UPDATE_PRODUCT_URL,
+        CREATE_UPDATE_STOCK_URL,
+        CREATE_UPDATE_PRICE_URL,
+        ORDER_URL,
+        START_ORDER_HANDLING_URL,
+        GENERATE_INVOICE_URL,
+        CANCEL_ORDER_URL,
+    )
+}
+
+
+def limited_call(endpoint, func, *args, **kwargs):
+    """Call func while holding a slot of the endpoint's adaptive limiter."""
+    limiter = ENDPOINT_LIMITERS[endpoint]
+    limiter.acquire()
+    start = time.monotonic()
+    success = False
+    try:
+        result = func(*args, **kwargs)
+        # 429 and 5xx responses come back without raising but still signal overload,
+        # other 4xx responses (bad token, unknown orderId) count as a normal sample
+        status_code = getattr(result, "status_code", 200)
+        success = not (status_code == 429 or status_code >= 500)
+        return result
+    finally:
+        latency = time.monotonic() - start
+        limiter.release(latency, success)
+        if CURRENT_PROFILE is not None:
+            CURRENT_PROFILE.record_http(latency, f"{func.__name__.upper()} {args[0]}")
+
+
+def get_concurrency_limits():
+    """Return the current concurrency limit and in-flight count for each endpoint."""
+    return {
+        endpoint: {"limit": int(limiter.limit), "in_flight": limiter.in_flight}
+        for endpoint, limiter in ENDPOINT_LIMITERS.items()
+    }
+
+
+def log_concurrency_limits(job_name):
+    """Write a snapshot of every endpoint's concurrency limit to CONCURRENCY_LOG_FILE."""
+    for endpoint, state in get_concurrency_limits().items():
+        log_concurrency(f"Concurrency limit after {job_name} for {endpoint}: {state['limit']} "
+                        f"(in flight: {state['in_flight']})")
+
+
+def reports_concurrency_limits(job):
+    """Wrap a scheduled job so the current concurrency limits are logged after each run."""
+    @functools.wraps(job)
+    def wrapper(*args, **kwargs):
+        try:
+            return job(*args, **kwargs)
+        finally:
+            log_concurrency_limits(job.__name__)
+
+    return wrapper
+
+
+
+
+
+# Profiling of scheduled jobs: sampled stacks and slowest HTTP/SQL calls
+class JobProfile:
+    """Collect timings of HTTP calls and SQL statements made during one job run."""
+
+    def __init__(self, name):
+        self.name = name
+        self.http_calls = []
+        self.sql_statements = []
+        self._lock = threading.Lock()
+
+    def record_http(self, duration, description):
+        with self._lock:
+            self.http_calls.append((duration, description))
+
+    def record_sql(self, duration, statement):
+        with self._lock:
+            self.sql_statements.append((duration, " ".join(statement.split())))
+
+    def write_slowest(self, path, top_n=PROFILE_TOP_N):
+        """Write the slowest HTTP calls and SQL statements of the run to a report file."""
+        with open(path, "w") as report:
+            for label, timings in (("HTTP calls", self.http_calls), ("SQL statements", self.sql_statements)):
+                slowest = sorted(timings, key=lambda timing: timing[0], reverse=True)[:top_n]
+                report.write(f"Slowest {len(slowest)} of {len(timings)} {label} in {self.name}:\n")
+                for duration, description in slowest:
+                    report.write(f"    {duration:.3f}s {description}\n")
+
+
+# Profile of the job currently running, None when profiling is off
+CURRENT_PROFILE = None
+
+
+class ProfiledCursor:
+    """Cursor wrapper that records how long each statement takes."""
+
+    def __init__(self, cursor, profile):
+        self._cursor = cursor
+        self._profile = profile
+
+    def execute(self, sql, *params):
+        start = time.monotonic()
+        try:
+            return self._cursor.execute(sql, *params)
+        finally:
+            self._profile.record_sql(time.monotonic() - start, sql)
+
+    def executemany(self, sql, params):
+        start = time.monotonic()
+        try:
+            return self._cursor.executemany(sql, params)
+        finally:
+            self._profile.record_sql(time.monotonic() - start, f"{sql} [x{len(params)}]")
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ProfiledConnection:
+    """Connection wrapper handing out ProfiledCursor objects."""
+
+    def __init__(self, connection, profile):
+        self._connection = connection
+        self._profile = profile
+
+    def cursor(self):
+        return ProfiledCursor(self._connection.cursor(), self._profile)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def connect_db():
+    """Open a database connection, instrumented when a job is being profiled."""
+    connection = pyodbc.connect(DB_CONNECTION)
+    profile = CURRENT_PROFILE
+    if profile is not None:
+        return ProfiledConnection(connection, profile)
+    return connection
+
+
+class StackSampler(threading.Thread):
+    """Periodically sample the stacks of all threads and count collapsed stacks."""
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stacks = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack = ";".join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write_collapsed(self, path):
+        """Write stacks in the collapsed format read by flamegraph.pl and speedscope."""
+        with open(path, "w") as output:
+            for stack, count in sorted(self.stacks.items()):
+                output.write(f"{stack} {count}\n")
+
+
+def profiled(job):
+    """
+    Wrap a scheduled job so that, when PROFILING_ENABLED is set, each run writes
+    a collapsed-stack file sampled from all threads (the job's profile) and a
+    report of the slowest HTTP calls and SQL statements to PROFILE_DIR.
+    The sampler is used instead of cProfile because most of the work runs on
+    worker threads, which cProfile does not see.
+    """
+    @functools.wraps(job)
+    def wrapper(*args, **kwargs):
+        global CURRENT_PROFILE
+        if not PROFILING_ENABLED:
+            return job(*args, **kwargs)
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base_path = os.path.join(PROFILE_DIR, f"{job.__name__}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        CURRENT_PROFILE = JobProfile(job.__name__)
+        sampler = StackSampler()
+        sampler.start()
+        start = time.monotonic()
+        try:
+            return job(*args, **kwargs)
+        finally:
+            sampler.stop()
+            profile, CURRENT_PROFILE = CURRENT_PROFILE, None
+            try:
+                sampler.write_collapsed(f"{base_path}.collapsed")
+                profile.write_slowest(f"{base_path}.slowest.txt")
+                print(f"Profiled {job.__name__} in {time.monotonic() - start:.2f}s, output written to {base_path}.*")
+            except Exception as e:
+                log_error(f"Failed to write profile for {job.__name__}. Error: {e}")
+                print(f"Failed to write profile for {job.__name__}. Error: {e}")
+
+    return wrapper
+
+
+
+
+
 # Fetch token from database for a specific location
 def get_static_token(location):
     """
     Retrieve the static token for a given location from the database.
     """
     try:
-        connection = pyodbc.connect(DB_CONNECTION)
+        connection = connect_db()
         cursor = connection.cursor()
 
         # Fetch the token for the specific location
@@ -91,7 +393,7 @@ def get_static_token(location):
 def fetch_items_from_db():
     """Fetch items from the ProductsSHOPAZ."""
     try:
-        connection = pyodbc.connect(DB_CONNECTION)
+        connection = connect_db()
         cursor = connection.cursor()
         cursor.execute("SELECT * FROM ProductsSHOPAZ WHERE changeFlag = 0")
         rows = cursor.fetchall()
@@ -152,17 +454,22 @@ def create_update_products():
             continue
 
         def request_func(item):
-            response = requests.post(CREATE_UPDATE_PRODUCT_URL, json=[item], headers=headers, timeout=30)
+            response = limited_call(CREATE_UPDATE_PRODUCT_URL, requests.post, CREATE_UPDATE_PRODUCT_URL,
+                                    json=[item], headers=headers, timeout=30)
             response.raise_for_status()
             return response
 
-        for external_id, item in filtered_items:
+        def post_item(external_id, item):
             response = retry_request(request_func, item=item)
             if response and response.status_code == 200:
                 print(f"Item {external_id} posted successfully.")
             else:
                 log_error(f"Failed to post item {external_id}.")
 
+        # The endpoint's adaptive limiter decides how many posts are actually in flight
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+            list(executor.map(lambda entry: post_item(*entry), filtered_items))
+
 
 
 
@@ -171,7 +478,7 @@ def create_update_products():
 def fetch_stock_updates_from_db():
     """Fetch stock updates from the database along with location."""
     try:
-        connection = pyodbc.connect(DB_CONNECTION)
+        connection = connect_db()
         cursor = connection.cursor()
         cursor.execute("SELECT skuId, quantity, vtexWarehouseId, location FROM StockTableSHOPAZ WHERE changeFlag = 0")
         rows = cursor.fetchall()
@@ -200,18 +507,19 @@ def update_stock():
         location = item["location"]
         grouped_by_location.setdefault(location, []).append(item)
 
-    for location, items in grouped_by_location.items():
+    def post_location(location, items):
         # Fetch the static token for the location
         token = get_static_token(location)
         if not token:
             log_error(f"No valid token for location: {location}")
             print(f"No valid token for location: {location}")
-            continue
+            return
 
         headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
         def request_func():
-            response = requests.post(CREATE_UPDATE_STOCK_URL, json=items, headers=headers, timeout=30)
+            response = limited_call(CREATE_UPDATE_STOCK_URL, requests.post, CREATE_UPDATE_STOCK_URL,
+                                    json=items, headers=headers, timeout=30)
             response.raise_for_status()
             return response
 
@@ -221,6 +529,10 @@ def update_stock():
         else:
             log_error(f"Failed to post stock items for location {location}.")
 
+    # The endpoint's adaptive limiter decides how many posts are actually in flight
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        list(executor.map(lambda entry: post_location(*entry), grouped_by_location.items()))
+
 
 
 
@@ -228,7 +540,7 @@ def update_stock():
 def fetch_price_updates_from_db():
     """Fetch price updates from the database along with location."""
     try:
-        connection = pyodbc.connect(DB_CONNECTION)
+        connection = connect_db()
         cursor = connection.cursor()
         cursor.execute("""
             SELECT skuId, price, discountPrice, minQuantity, discountMinQuantity, fromDate, toDate, location
@@ -266,7 +578,7 @@ def fetch_price_updates_from_db():
 def update_price_flag(sku_id):
     """Update the changeFlag for a specific price record."""
     try:
-        connection = pyodbc.connect(DB_CONNECTION)
+        connection = connect_db()
         cursor = connection.cursor()
         cursor.execute("""
             UPDATE PriceTableSHOPAZ
@@ -292,19 +604,20 @@ def update_price(price_items):
         location = item["location"]
         grouped_by_location.setdefault(location, []).append(item)
 
-    for location, items in grouped_by_location.items():
+    def post_location(location, items):
         # Fetch the static token for the location
         token = get_static_token(location)
         if not token:
             log_error(f"No valid token for location: {location}")
             print(f"No valid token for location: {location}")
-            continue
+            return
 
         headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         payload = [{"skuId": i["skuId"], "price": i["price"]} for i in items]
 
         def request_func():
-            response = requests.post(CREATE_UPDATE_PRICE_URL, json=payload, headers=headers, timeout=30)
+            response = limited_call(CREATE_UPDATE_PRICE_URL, requests.post, CREATE_UPDATE_PRICE_URL,
+                                    json=payload, headers=headers, timeout=30)
             response.raise_for_status()
             return response
 
@@ -316,14 +629,201 @@ def update_price(price_items):
         else:
             log_error(f"Failed to post price items for location {location}.")
 
+    # The endpoint's adaptive limiter decides how many posts are actually in flight
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        list(executor.map(lambda entry: post_location(*entry), grouped_by_location.items()))
+
+
 
 
 
+# Sentinel passed through the order pipeline queues once a stage has finished
+PIPELINE_DONE = object()
+
+
+def fetch_orders_for_location(location):
+    """Fetch orders for one location from the GetOrders endpoint."""
+    # Fetch the static token for the location
+    token = get_static_token(location)
+    if not token:
+        log_error(f"No valid token for location: {location}")
+        print(f"No valid token for location: {location}")
+        return []
+
+    # Define the request payload
+    payload = {
+        "echo": "get_all_orders",
+        "search": "",
+        "displayLength": 1000,
+        "displayStart": 0,
+        "sortCol": 0,
+        "sortDir": "desc",
+        "sortingCols": 1,
+        "sColumns": "",
+        "status":"",
+        "includeDetails": True
+    }
+
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+    # Send API request to GetOrders endpoint
+    response = limited_call(ORDER_URL, requests.post, ORDER_URL, json=payload, headers=headers, timeout=30)
+    response.raise_for_status()
+    data = response.json()
+
+    # Log the response for debugging
+    print(f"API Response for location {location}: {data}")
+
+    orders = data.get("Data", [])
+    if not orders:
+        print(f"No orders found for location {location}.")
+    return orders
+
+
+def normalize_orders(location, orders):
+    """Flatten API orders into OrdersTableSHOPAZ rows."""
+    rows = []
+    for order in orders:
+        details = order["OrderDetails"][0]
+        posting_description = f'{order["RecipientName"]}, {order["RecipientCity"]}, {order["RecipientPhone"]}'
+        document_type = 2 if order["Status"] == "cancellation-requested" else 0
+        rows.append((
+            order["Id"], location, order["CreateDate"], order["OrderId"],
+            details["Quantity"], details["UnitPrice"], details["ProductNo"], details["ProductDescription"],
+            posting_description, 0, document_type
+        ))
+    return rows
+
+
+def insert_order_batch(connection, batch):
+    """Insert a batch of order rows, skipping Ids that already exist."""
+    cursor = connection.cursor()
+    ids = [row[0] for row in batch]
+    placeholders = ", ".join("?" for _ in ids)
+    cursor.execute(f"SELECT Id FROM OrdersTableSHOPAZ WHERE Id IN ({placeholders})", *ids)
+    existing = {row[0] for row in cursor.fetchall()}
+
+    new_rows = []
+    for row in batch:
+        if row[0] in existing:
+            # Skip if the record already exists
+            print(f"Record with Id={row[0]} already exists. Skipping insertion.")
+            continue
+        existing.add(row[0])
+        new_rows.append(row)
+
+    if new_rows:
+        # Enable IDENTITY_INSERT for manual Id insertion
+        cursor.execute("SET IDENTITY_INSERT OrdersTableSHOPAZ ON")
+        cursor.executemany("""
+            INSERT INTO OrdersTableSHOPAZ 
+            (Id, Location, OrderDate, OrderId, Quantity, Price, ItemNo, ItemDescription, PostingDescription, ChangeFlag, DocumentType)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, new_rows)
+        # Disable IDENTITY_INSERT after insertion
+        cursor.execute("SET IDENTITY_INSERT OrdersTableSHOPAZ OFF")
+    connection.commit()
+    print(f"Inserted {len(new_rows)} orders into DB ({len(batch) - len(new_rows)} skipped).")
+
+
+def order_fetcher(location, fetched_queue):
+    """Pipeline stage 1: fetch orders for a location and hand them to the normalizer."""
+    try:
+        orders = fetch_orders_for_location(location)
+        if orders:
+            fetched_queue.put((location, orders))
+    except Exception as e:
+        log_error(f"Failed to fetch orders for location {location}. Error: {e}")
+        print(f"Failed to fetch orders for location {location}. Error: {e}")
+
+
+def order_normalizer(fetched_queue, row_queue):
+    """Pipeline stage 2: turn fetched orders into rows for the DB writer."""
+    done = False
+    try:
+        while True:
+            item = fetched_queue.get()
+            if item is PIPELINE_DONE:
+                done = True
+                break
+            location, orders = item
+            try:
+                rows = normalize_orders(location, orders)
+            except Exception as e:
+                log_error(f"Failed to normalize orders for location {location}. Error: {e}")
+                print(f"Failed to process orders for location {location}. Error: {e}")
+                continue
+            for row in rows:
+                row_queue.put(row)
+    except Exception as e:
+        log_error(f"Order normalizer failed. Error: {e}")
+        print(f"Order normalizer failed. Error: {e}")
+    finally:
+        # Keep draining so fetchers never block, then let the writer finish
+        while not done:
+            done = fetched_queue.get() is PIPELINE_DONE
+        row_queue.put(PIPELINE_DONE)
+
+
+def order_writer(row_queue):
+    """Pipeline stage 3: insert rows into OrdersTableSHOPAZ in batches of ORDER_BATCH_SIZE."""
+    try:
+        connection = connect_db()
+    except Exception as e:
+        log_error(f"Failed to connect order writer to database. Error: {e}")
+        print(f"Failed to connect order writer to database. Error: {e}")
+        connection = None
+
+    def flush(batch):
+        if not batch or connection is None:
+            return
+        try:
+            insert_order_batch(connection, batch)
+        except Exception as e:
+            log_error(f"Failed to insert batch of {len(batch)} orders. Error: {e}")
+            print(f"Failed to insert batch of {len(batch)} orders. Error: {e}")
+            try:
+                connection.rollback()
+            except Exception as rollback_error:
+                log_error(f"Failed to roll back order batch. Error: {rollback_error}")
+                print(f"Failed to roll back order batch. Error: {rollback_error}")
+
+    # Keep draining the queue even without a connection so upstream stages never block
+    done = False
+    batch = []
+    try:
+        while True:
+            row = row_queue.get()
+            if row is PIPELINE_DONE:
+                done = True
+                break
+            batch.append(row)
+            if len(batch) >= ORDER_BATCH_SIZE:
+                flush(batch)
+                batch = []
+        flush(batch)
+    except Exception as e:
+        log_error(f"Order writer failed. Error: {e}")
+        print(f"Order writer failed. Error: {e}")
+    finally:
+        while not done:
+            done = row_queue.get() is PIPELINE_DONE
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception as e:
+                log_error(f"Failed to close order writer connection. Error: {e}")
+                print(f"Failed to close order writer connection. Error: {e}")
+
 
 def fetch_and_insert_orders():
-    """Fetch orders from API for each location and insert into OrdersTableSHOPAZ."""
+    """
+    Fetch orders from API for each location and insert into OrdersTableSHOPAZ.
+    Fetching, normalizing and DB writes run as a pipeline connected by bounded
+    queues, so API calls for later locations overlap with inserts for earlier ones.
+    """
     try:
-        connection = pyodbc.connect(DB_CONNECTION)
+        connection = connect_db()
         cursor = connection.cursor()
         
         # Fetch all locations from the UsersTableSHOPAZ
@@ -331,97 +831,23 @@ def fetch_and_insert_orders():
         locations = [row[0] for row in cursor.fetchall()]
         connection.close()
 
-        for location in locations:
-            # Fetch the static token for the location
-            token = get_static_token(location)
-            if not token:
-                log_error(f"No valid token for location: {location}")
-                print(f"No valid token for location: {location}")
-                continue
+        fetched_queue = queue.Queue(maxsize=ORDER_FETCH_QUEUE_SIZE)
+        row_queue = queue.Queue(maxsize=ORDER_ROW_QUEUE_SIZE)
+        normalizer = threading.Thread(target=order_normalizer, args=(fetched_queue, row_queue))
+        writer = threading.Thread(target=order_writer, args=(row_queue,))
+        normalizer.start()
+        writer.start()
 
-            # Define the request payload
-            payload = {
-                "echo": "get_all_orders",
-                "search": "",
-                "displayLength": 1000,
-                "displayStart": 0,
-                "sortCol": 0,
-                "sortDir": "desc",
-                "sortingCols": 1,
-                "sColumns": "",
-                "status":"",
-                "includeDetails": True
-            }
-            
-            headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-            
-            try:
-                # Send API request to GetOrders endpoint
-                response = requests.post(ORDER_URL, json=payload, headers=headers, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Log the response for debugging
-                print(f"API Response for location {location}: {data}")
-
-                # Process the API response
-                orders = data.get("Data", [])
-                if not orders:
-                    print(f"No orders found for location {location}.")
-                    continue
-                
-                connection = pyodbc.connect(DB_CONNECTION)
-                cursor = connection.cursor()
-                
-                # Enable IDENTITY_INSERT for manual Id insertion
-                cursor.execute("SET IDENTITY_INSERT OrdersTableSHOPAZ ON")
-                
-                for order in orders:
-                    # Extract necessary data
-                    record_id = order["Id"]
-                    order_date = order["CreateDate"]
-                    order_id = order["OrderId"]
-                    quantity = order["OrderDetails"][0]["Quantity"]
-                    price = order["OrderDetails"][0]["UnitPrice"]
-                    item_no = order["OrderDetails"][0]["ProductNo"]
-                    item_description = order["OrderDetails"][0]["ProductDescription"]
-                    posting_description = f'{order["RecipientName"]}, {order["RecipientCity"]}, {order["RecipientPhone"]}'
-                    change_flag = 0
-                    document_type = 2 if order["Status"] == "cancellation-requested" else 0
-
-                    # Check if the Id already exists in the database
-                    cursor_check = connection.cursor()
-                    cursor_check.execute("SELECT COUNT(*) FROM OrdersTableSHOPAZ WHERE Id = ?", record_id)
-                    exists = cursor_check.fetchone()[0]
-
-                    if exists > 0:
-                        # Skip if the record already exists
-                        print(f"Record with Id={record_id} already exists. Skipping insertion.")
-                        continue
-
-                    # Print data being prepared for insertion
-                    print(f"Inserting into DB: Id={record_id}, Location={location}, OrderDate={order_date}, "
-                          f"OrderId={order_id}, Quantity={quantity}, Price={price}, "
-                          f"ItemNo={item_no}, ItemDescription={item_description}, "
-                          f"PostingDescription={posting_description}, ChangeFlag={change_flag}, "
-                          f"DocumentType={document_type}")
-                    
-                    # Insert data into OrdersTableSHOPAZ
-                    cursor.execute("""
-                        INSERT INTO OrdersTableSHOPAZ 
-                        (Id, Location, OrderDate, OrderId, Quantity, Price, ItemNo, ItemDescription, PostingDescription, ChangeFlag, DocumentType)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, record_id, location, order_date, order_id, quantity, price, item_no, item_description, posting_description, change_flag, document_type)
-                
-                # Disable IDENTITY_INSERT after insertion
-                cursor.execute("SET IDENTITY_INSERT OrdersTableSHOPAZ OFF")
-                
-                connection.commit()
-                connection.close()
-                print(f"Successfully inserted orders for location: {location}")
-            except Exception as e:
-                log_error(f"Failed to fetch or insert orders for location {location}. Error: {e}")
-                print(f"Failed to process orders for location {location}. Error: {e}")
+        try:
+            # The endpoint's adaptive limiter decides how many fetches are actually in flight
+            with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+                for location in locations:
+                    executor.submit(order_fetcher, location, fetched_queue)
+        finally:
+            fetched_queue.put(PIPELINE_DONE)
+            normalizer.join()
+            writer.join()
+        print("Finished fetching and inserting orders.")
     except Exception as e:
         log_error(f"Error in fetch_and_insert_orders function: {e}")
         print(f"Error in fetch_and_insert_orders function: {e}")
@@ -437,7 +863,7 @@ def start_order_handling():
     then send GET requests to the /Sync/StartOrderHandling endpoint for each OrderId.
     """
     try:
-        connection = pyodbc.connect(DB_CONNECTION)
+        connection = connect_db()
         cursor = connection.cursor()
 
         # Fetch records from the OrdersTableSHOPAZ
@@ -453,24 +879,24 @@ def start_order_handling():
             print("No orders with ChangeFlag = 1 and OrderStatus = 'Pranuar' found.")
             return
 
-        for order_id, location in rows:
+        def handle_order(order_id, location):
             # Fetch the static token for the location
             token = get_static_token(location)
             if not token:
                 log_error(f"No valid token for location: {location}")
                 print(f"No valid token for location: {location}")
-                continue
+                return
 
             headers = {"Authorization": f"Bearer {token}"}
-            url = f"{BASE_URL}/Sync/StartOrderHandling?orderId={order_id}"
+            url = f"{START_ORDER_HANDLING_URL}?orderId={order_id}"
 
             try:
-                response = requests.get(url, headers=headers, timeout=30)
+                response = limited_call(START_ORDER_HANDLING_URL, requests.get, url, headers=headers, timeout=30)
                 response.raise_for_status()
 
                 # If successful, update the ChangeFlag in the database
                 print(f"Successfully processed OrderId: {order_id}")
-                connection = pyodbc.connect(DB_CONNECTION)
+                connection = connect_db()
                 cursor = connection.cursor()
                 cursor.execute("""
                     UPDATE OrdersTableSHOPAZ
@@ -482,6 +908,9 @@ def start_order_handling():
             except requests.exceptions.RequestException as e:
                 log_error(f"Failed to process OrderId: {order_id}. Error: {e}")
                 print(f"Failed to process OrderId: {order_id}. Error: {e}")
+
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+            list(executor.map(lambda row: handle_order(*row), rows))
     except Exception as e:
         log_error(f"Error in start_order_handling function: {e}")
         print(f"Error in start_order_handling function: {e}")
@@ -497,7 +926,7 @@ def generate_invoice():
     then send GET requests to the /Sync/GenerateInvoice endpoint for each OrderId.
     """
     try:
-        connection = pyodbc.connect(DB_CONNECTION)
+        connection = connect_db()
         cursor = connection.cursor()
 
         # Fetch distinct records from the OrdersTableSHOPAZ
@@ -513,24 +942,24 @@ def generate_invoice():
             print("No orders with ChangeFlag = 1 and OrderStatus = 'READY' found.")
             return
 
-        for order_id, location in rows:
+        def handle_order(order_id, location):
             # Fetch the static token for the location
             token = get_static_token(location)
             if not token:
                 log_error(f"No valid token for location: {location}")
                 print(f"No valid token for location: {location}")
-                continue
+                return
 
             headers = {"Authorization": f"Bearer {token}"}
-            url = f"{BASE_URL}/Sync/GenerateInvoice?orderId={order_id}"
+            url = f"{GENERATE_INVOICE_URL}?orderId={order_id}"
 
             try:
-                response = requests.get(url, headers=headers, timeout=30)
+                response = limited_call(GENERATE_INVOICE_URL, requests.get, url, headers=headers, timeout=30)
                 response.raise_for_status()
 
                 # If successful, update the ChangeFlag in the database to 2
                 print(f"Successfully generated invoice for OrderId: {order_id}")
-                connection = pyodbc.connect(DB_CONNECTION)
+                connection = connect_db()
                 cursor = connection.cursor()
                 cursor.execute("""
                     UPDATE OrdersTableSHOPAZ
@@ -542,6 +971,9 @@ def generate_invoice():
             except requests.exceptions.RequestException as e:
                 log_error(f"Failed to generate invoice for OrderId: {order_id}. Error: {e}")
                 print(f"Failed to generate invoice for OrderId: {order_id}. Error: {e}")
+
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+            list(executor.map(lambda row: handle_order(*row), rows))
     except Exception as e:
         log_error(f"Error in generate_invoice function: {e}")
         print(f"Error in generate_invoice function: {e}")
@@ -556,7 +988,7 @@ def cancel_order():
     then send GET requests to the /Sync/CancelOrder endpoint twice for each OrderId to confirm cancellation.
     """
     try:
-        connection = pyodbc.connect(DB_CONNECTION)
+        connection = connect_db()
         cursor = connection.cursor()
 
         # Fetch records that meet the specified criteria
@@ -572,30 +1004,30 @@ def cancel_order():
             print("No orders found with ChangeFlag = 1, OrderStatus = 'CANCELLED', and valid Reason.")
             return
 
-        for order_id, location, reason in rows:
+        def handle_order(order_id, location, reason):
             # Fetch the static token for the location
             token = get_static_token(location)
             if not token:
                 log_error(f"No valid token for location: {location}")
                 print(f"No valid token for location: {location}")
-                continue
+                return
 
             headers = {"Authorization": f"Bearer {token}"}
-            url = f"{BASE_URL}/Sync/CancelOrder?orderId={order_id}&reason={reason.replace(' ', '+')}"
+            url = f"{CANCEL_ORDER_URL}?orderId={order_id}&reason={reason.replace(' ', '+')}"
 
             # Send the first GET request
             try:
-                response_1 = requests.get(url, headers=headers, timeout=30)
+                response_1 = limited_call(CANCEL_ORDER_URL, requests.get, url, headers=headers, timeout=30)
                 response_1.raise_for_status()
                 print(f"First cancellation request successful for OrderId: {order_id}")
 
                 # Send the second GET request for confirmation
-                response_2 = requests.get(url, headers=headers, timeout=30)
+                response_2 = limited_call(CANCEL_ORDER_URL, requests.get, url, headers=headers, timeout=30)
                 response_2.raise_for_status()
                 print(f"Second confirmation request successful for OrderId: {order_id}")
 
                 # If successful, update the ChangeFlag in the database to 2
-                connection = pyodbc.connect(DB_CONNECTION)
+                connection = connect_db()
                 cursor = connection.cursor()
                 cursor.execute("""
                     UPDATE OrdersTableSHOPAZ
@@ -608,6 +1040,9 @@ def cancel_order():
             except requests.exceptions.RequestException as e:
                 log_error(f"Failed to process cancellation for OrderId: {order_id}. Error: {e}")
                 print(f"Failed to process cancellation for OrderId: {order_id}. Error: {e}")
+
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+            list(executor.map(lambda row: handle_order(*row), rows))
     except Exception as e:
         log_error(f"Error in cancel_order function: {e}")
         print(f"Error in cancel_order function: {e}")
@@ -623,7 +1058,7 @@ def get_sticker_report():
     and update the Sticker field with the Base64 response.
     """
     try:
-        connection = pyodbc.connect(DB_CONNECTION)
+        connection = connect_db()
         cursor = connection.cursor()
 
         # Fetch distinct OrderId where Sticker is NULL or empty
@@ -660,7 +1095,7 @@ def get_sticker_report():
                 print(f"Successfully fetched sticker report for OrderId: {order_id}")
 
                 # Update the Sticker field in the database
-                connection = pyodbc.connect(DB_CONNECTION)
+                connection = connect_db()
                 cursor = connection.cursor()
                 cursor.execute("""
                     UPDATE OrdersTableSHOPAZ
@@ -702,13 +1137,13 @@ def get_sticker_report():
 
 
 # Schedule the functions to run every 30 minutes
-schedule.every(30).minutes.do(create_update_products)
-schedule.every(30).minutes.do(update_stock)
-schedule.every(30).minutes.do(update_price)
-schedule.every(30).minutes.do(fetch_and_insert_orders)
-schedule.every(30).minutes.do(start_order_handling)
-schedule.every(30).minutes.do(generate_invoice)
-schedule.every(30).minutes.do(cancel_order)
+schedule.every(30).minutes.do(reports_concurrency_limits(profiled(create_update_products)))
+schedule.every(30).minutes.do(reports_concurrency_limits(profiled(update_stock)))
+schedule.every(30).minutes.do(reports_concurrency_limits(profiled(update_price)))
+schedule.every(30).minutes.do(reports_concurrency_limits(profiled(fetch_and_insert_orders)))
+schedule.every(30).minutes.do(reports_concurrency_limits(profiled(start_order_handling)))
+schedule.every(30).minutes.do(reports_concurrency_limits(profiled(generate_invoice)))
+schedule.every(30).minutes.do(reports_concurrency_limits(profiled(cancel_order)))
 
 print("Scheduled functions to run every 30 minutes.")
 